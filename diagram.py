@@ -1,54 +1,103 @@
-import math
+from collections import namedtuple
 
+from matplotlib import rcParams
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.colors import hsv_to_rgb, rgb2hex
+from matplotlib.collections import LineCollection
 from matplotlib.figure import Figure
-from matplotlib.transforms import Bbox
+from matplotlib.image import imsave
+from matplotlib.transforms import Affine2D, Bbox
+import numpy as np
 
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QRubberBand
 
-    
-# Coordinates
-def x_coord(lateral_offset, check):
-    return check['center_x'] + lateral_offset*check['right_x']
-def y_coord(lateral_offset, check):
-    return check['center_y'] + lateral_offset*check['right_y']
-def z_coord(lateral_offset, check):
-    return check['center_z'] + lateral_offset*check['right_z']
-def neg_x_coord(lateral_offset, check):
-    return -(check['center_x'] + lateral_offset*check['right_x'])
-def neg_y_coord(lateral_offset, check):
-    return -(check['center_y'] + lateral_offset*check['right_y'])
-def neg_z_coord(lateral_offset, check):
-    return -(check['center_z'] + lateral_offset*check['right_z'])
-def get_checkpoint_position_function(coord_str):
-    if coord_str == 'x':
-        return x_coord
-    if coord_str == 'y':
-        return y_coord
-    if coord_str == 'z':
-        return z_coord
-    if coord_str == '-x':
-        return neg_x_coord
-    if coord_str == '-y':
-        return neg_y_coord
-    if coord_str == '-z':
-        return neg_z_coord
-def get_point_position_function(coord_str):
-    if coord_str == 'x':
-        return lambda p: p['x']
-    if coord_str == 'y':
-        return lambda p: p['y']
-    if coord_str == 'z':
-        return lambda p: p['z']
-    if coord_str == '-x':
-        return lambda p: -p['x']
-    if coord_str == '-y':
-        return lambda p: -p['y']
-    if coord_str == '-z':
-        return lambda p: -p['z']
 
+# Colors for paths and crossings: HSV value 0.0 and 0.6 respectively
+BLACK_HEX = '#000000'
+GRAY_HEX = '#999999'
+
+# zorder for all the data artists: the default zorder of plot() lines
+DATA_ZORDER = 2
+
+# Diagram axis choices, as (coordinate index, sign). For example, '-z' means
+# the diagram axis shows the game's z coordinate, negated.
+AXES = {
+    'x': (0, 1),
+    'y': (1, 1),
+    'z': (2, 1),
+    '-x': (0, -1),
+    '-y': (1, -1),
+    '-z': (2, -1),
+}
+
+def projection_matrix(haxis, vaxis):
+    """
+    2x3 matrix which maps game x,y,z coordinates to the diagram's h,v
+    coordinates.
+    """
+    matrix = np.zeros((2, 3), dtype=np.float32)
+    for row, axis in enumerate([haxis, vaxis]):
+        index, sign = AXES[axis]
+        matrix[row, index] = sign
+    return matrix
+
+# Projection matrices for every pair of axes, built once at import time, so
+# that changing the diagram's axes is just a lookup.
+PROJECTIONS = {
+    (haxis, vaxis): projection_matrix(haxis, vaxis)
+    for haxis in AXES for vaxis in AXES}
+
+def project_points(points, projection):
+    """
+    Diagram positions for an array of points whose last dimension is x,y,z.
+    Returns an array of the same shape, except the last dimension is h,v.
+    """
+    # A matrix product projects all the points in one NumPy call.
+    return points @ projection.T
+
+def lateral_positions(centers_hv, rights_hv, lateral_offsets):
+    """
+    Diagram positions for all checkpoints at once.
+    centers_hv and rights_hv are the (N,2) projected centers and right
+    vectors, and lateral_offsets is (N,k): k offsets along each checkpoint's
+    right vector. Returns an (N,k,2) array.
+    """
+    # The projection is linear, so offsetting after projecting gives the
+    # same result as projecting the offset 3D points.
+    return (
+        centers_hv[:, None, :]
+        + lateral_offsets[:, :, None]*rights_hv[:, None, :])
+
+def fit_aspect(xlim, ylim, canvas_width, canvas_height):
+    """
+    Expand the given axes limits in one dimension, keeping them centered,
+    so that they match the canvas's aspect ratio.
+    Returns the new (xlim, ylim).
+    """
+    hrange = xlim[1] - xlim[0]
+    vrange = ylim[1] - ylim[0]
+    # One of these targets equals the current range, so only the other
+    # dimension actually gets extra space.
+    target_hrange = max(hrange, vrange*(canvas_width / canvas_height))
+    target_vrange = max(vrange, hrange*(canvas_height / canvas_width))
+    extra_hspace_one_side = (target_hrange - hrange) / 2
+    extra_vspace_one_side = (target_vrange - vrange) / 2
+    return (
+        (xlim[0] - extra_hspace_one_side, xlim[1] + extra_hspace_one_side),
+        (ylim[0] - extra_vspace_one_side, ylim[1] + extra_vspace_one_side))
+
+# What each part of the plot depends on. See Diagram.draw_checkpoints().
+PlotState = namedtuple(
+    'PlotState', ['checkpoints', 'extended', 'numbers', 'path', 'crossings'])
+
+def checkpoint_mask(numbers, checkpoint_set):
+    """
+    Boolean array of which checkpoint numbers are in the set.
+    checkpoint_set is a boolean array indexed by checkpoint number.
+    """
+    # Numbers past the end of the array aren't in the set.
+    in_range = numbers < len(checkpoint_set)
+    return in_range & checkpoint_set[np.where(in_range, numbers, 0)]
 
 class Diagram():
     
@@ -61,6 +110,8 @@ class Diagram():
         self.canvas.setMinimumWidth(200)
         self.canvas.setMinimumHeight(200)
         self.previous_dpi = self.figure.get_dpi()
+        self.previous_setup_state = None
+        self.previous_setup_limits = None
         # Add axes that fill the figure (while maintaining aspect ratio)
         # https://stackoverflow.com/a/6377406/
         self.axes = self.figure.add_axes([0, 0, 1, 1])
@@ -74,6 +125,48 @@ class Diagram():
         self.canvas.setCursor(Qt.OpenHandCursor)
         self.drag_position = None
         
+        # Mouse motion events can arrive much faster than we can redraw the
+        # diagram. So, we just note the latest mouse position as events
+        # arrive, and handle it (pan and coordinates display) at most once
+        # per timer interval.
+        self.pending_motion = None
+        self.motion_timer = QTimer()
+        self.motion_timer.setSingleShot(True)
+        self.motion_timer.setInterval(16)
+        self.motion_timer.timeout.connect(self.flush_motion)
+        
+        # Dragging the window's edge resizes the canvas many times in a row,
+        # redrawing it each time. While that's going on, we skip the slowest
+        # parts of drawing, and do a full draw once the size has settled.
+        self.resizing = False
+        self.resize_timer = QTimer()
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(100)
+        self.resize_timer.timeout.connect(self.finish_resize)
+        # Similarly, mousewheel/trackpad scrolling can send many scroll events
+        # in quick succession. We add up the zoom steps as they arrive, and
+        # apply them as one zoom per timer interval.
+        self.pending_zoom_steps = 0
+        self.pending_zoom_position = None
+        self.scroll_timer = QTimer()
+        self.scroll_timer.setSingleShot(True)
+        self.scroll_timer.setInterval(16)
+        self.scroll_timer.timeout.connect(self.flush_scroll)
+        
+        # Canvas to game coordinates conversion; see
+        # convert_coords_canvas_to_game().
+        self.canvas_to_game = None
+        self.axes.callbacks.connect(
+            'xlim_changed', self.invalidate_canvas_to_game)
+        self.axes.callbacks.connect(
+            'ylim_changed', self.invalidate_canvas_to_game)
+        
+        # Format string and axis signs for the coordinates display, for the
+        # axes given by previous_coords_state.
+        self.previous_coords_state = None
+        self.coords_format = None
+        self.coords_signs = None
+        
         self.rectangle_select_interaction = None
         self.save_rectangle = None
         self.rect_rubberband = QRubberBand(QRubberBand.Rectangle, self.canvas)
@@ -90,6 +183,56 @@ class Diagram():
             'scroll_event', self.scroll_event)
         self.canvas.mpl_connect(
             'resize_event', self.resize_event)
+        self.canvas.mpl_connect(
+            'draw_event', self.draw_event)
+        
+        # Checkpoints, paths, etc. are drawn as animated artists, on top of
+        # a saved background. This way, panning only has to redraw these
+        # artists, instead of the whole canvas.
+        # https://matplotlib.org/stable/users/explain/animations/blitting.html
+        self.background = None
+        
+        # These artists are created once here, and then refreshes just
+        # update their data. The order here is the drawing order: they all
+        # get the zorder of plot() lines, so that none of them jumps ahead.
+        self.checkpoint_lines = LineCollection(
+            [], zorder=DATA_ZORDER, animated=True)
+        self.axes.add_collection(self.checkpoint_lines)
+        self.checkpoint_markers = self.create_markers()
+        self.extended_lines = LineCollection(
+            [], zorder=DATA_ZORDER, animated=True)
+        self.axes.add_collection(self.extended_lines)
+        # Paths are plotted in black.
+        self.path_line, = self.axes.plot([], [], BLACK_HEX, animated=True)
+        self.crossing_fail_lines = LineCollection(
+            [], colors=GRAY_HEX, zorder=DATA_ZORDER, animated=True)
+        self.axes.add_collection(self.crossing_fail_lines)
+        self.crossing_success_lines = LineCollection(
+            [], colors=BLACK_HEX, zorder=DATA_ZORDER, animated=True)
+        self.axes.add_collection(self.crossing_success_lines)
+        self.crossing_markers = self.create_markers()
+        
+        self.previous_projection_state = None
+        self.previous_plot_state = None
+        # These are incremented whenever the checkpoint positions, path
+        # arrays, or crossing arrays are recomputed, so that the plot state
+        # can tell when they've changed.
+        self.positions_version = 0
+        self.path_version = 0
+        self.crossing_version = 0
+        # Path and crossing arrays, and the status data they were made from.
+        # No data to start with.
+        self.path_source = None
+        self.path_xyz = np.empty((0, 3), dtype=np.float32)
+        self.crossing_source = None
+        self.crossing_xyz = np.empty((0, 2, 3), dtype=np.float32)
+        self.crossing_success = np.empty(0, dtype=bool)
+        
+        # Text artists for checkpoint numbers. These are kept and reused
+        # across refreshes. shown_label_positions has the data coordinates
+        # of the ones currently in use.
+        self.label_texts = []
+        self.shown_label_positions = np.empty((0, 2))
     
     def refresh(self):
         
@@ -99,38 +242,121 @@ class Diagram():
         old_axes_xlim = self.axes.get_xlim()
         old_axes_ylim = self.axes.get_ylim()
         
-        self.axes.clear()
+        if self.status.checkpoints_changed:
+            self.update_checkpoint_arrays()
+        self.update_path_arrays()
+        self.compute_checkpoint_positions()
+        
         self.draw_checkpoints()
         self.setup_figure()
+        
+        self.background = None
         self.status.update_save_dimensions()
         
         # If the course is the same as the last refresh, we'd like to keep the
         # user's current pan and zoom positions.
-        # draw_checkpoints() calls plot() which seems to unavoidably change
-        # the limits, so we must revert the limits to before that call.
-        if not self.status.course_code_changed:
+        # setup_figure() sets the limits to fit the data, so we must revert
+        # the limits to before that call.
+        if not self.status.checkpoints_changed:
             self.axes.set_xlim(old_axes_xlim)
             self.axes.set_ylim(old_axes_ylim)
         
-        self.canvas.draw()
+        # Schedule the redraw rather than doing it right away, so that other
+        # redraw requests in the same event burst (such as a resize) are
+        # combined into a single draw.
+        self.canvas.draw_idle()
         
         self.deactivate_rectangle_select()
         
+    def draw_event(self, event):
+        # The whole canvas was just drawn, which skips animated artists.
+        # Save the background, then draw the animated artists on top.
+        if self.canvas.is_saving():
+            # Saving to a file draws everything, at the save DPI
+            return
+        if self.resizing:
+            # Mid-resize. The checkpoint numbers take the most time to draw,
+            # so leave them out, and don't save a background that'll be
+            # outdated by the next resize.
+            self.draw_data_artists(include_labels=False)
+            return
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.draw_data_artists()
+        
+    def cull_labels(self, region=None):
+        # Hide checkpoint numbers which are outside of the current view (or
+        # the given region, in canvas pixels), so that drawing doesn't spend
+        # time on them. This matters most when zoomed in, where most numbers
+        # are offscreen.
+        if len(self.shown_label_positions) == 0:
+            return
+        pixels = self.axes.transData.transform(self.shown_label_positions)
+        # The number's position is at one corner of the text, so allow a
+        # margin of a few characters' size.
+        margin = 3 * self.status.number_size * (self.figure.get_dpi() / 72)
+        bbox = region or self.axes.bbox
+        onscreen = (
+            (pixels[:, 0] >= bbox.x0 - margin)
+            & (pixels[:, 0] <= bbox.x1 + margin)
+            & (pixels[:, 1] >= bbox.y0 - margin)
+            & (pixels[:, 1] <= bbox.y1 + margin))
+        for text, visible in zip(self.label_texts, onscreen):
+            text.set_visible(visible)
+        
+    def draw_data_artists(self, include_labels=True):
+        if include_labels:
+            self.cull_labels()
+        # Draw in the same order as a full draw would (by zorder, then
+        # by the order the artists were added).
+        data_artists = [
+            artist for artist in self.axes.get_children()
+            if artist.get_animated()
+            and (include_labels or artist not in self.axes.texts)]
+        data_artists.sort(key=lambda artist: artist.get_zorder())
+        for artist in data_artists:
+            self.axes.draw_artist(artist)
+            
+    def blit_data_artists(self):
+        # Redraw just the data artists, over the saved background.
+        if self.background is None:
+            # No background yet, so draw the whole canvas. A draw may
+            # already be pending, in which case this doesn't add another.
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_data_artists()
+        self.canvas.blit(self.axes.bbox)
+        
     def canvas_width(self):
         return self.canvas.get_width_height()[0]
     def canvas_height(self):
         return self.canvas.get_width_height()[1]
             
     def convert_coords_canvas_to_game(self, x, y):
-        xlim = self.axes.get_xlim()
-        ylim = self.axes.get_ylim()
-        canvas_width, canvas_height = self.canvas.get_width_height()
-        return (
-            xlim[0] + (xlim[1] - xlim[0])*(x / canvas_width),
-            ylim[0] + (ylim[1] - ylim[0])*(y / canvas_height))
+        # The conversion is x0 + x*x_scale, y0 + y*y_scale. Those numbers
+        # only change with the axes limits (see invalidate_canvas_to_game()),
+        # so compute them once and reuse them for every mouse event.
+        if self.canvas_to_game is None:
+            xlim = self.axes.get_xlim()
+            ylim = self.axes.get_ylim()
+            canvas_width, canvas_height = self.canvas.get_width_height()
+            self.canvas_to_game = (
+                xlim[0], (xlim[1] - xlim[0]) / canvas_width,
+                ylim[0], (ylim[1] - ylim[0]) / canvas_height)
+        x0, x_scale, y0, y_scale = self.canvas_to_game
+        return (x0 + x*x_scale, y0 + y*y_scale)
+    
+    def invalidate_canvas_to_game(self, axes=None):
+        # Called whenever the axes limits change.
+        self.canvas_to_game = None
     
     def button_press_event(self, event):
         # Mouse button press
+        
+        # Handle any motion from before the button press, so that it isn't
+        # counted as a pan or as part of a rectangle
+        self.flush_motion()
+        
         self.rectangle_select_button_press_event(event)
         
         if not self.rectangle_select_interaction:
@@ -141,6 +367,10 @@ class Diagram():
         
     def button_release_event(self, event):
         # Mouse button release
+        
+        # Finish any pan or rectangle movement that hasn't been handled yet
+        self.flush_motion()
+        
         self.rectangle_select_button_release_event(event)
             
         # End pan
@@ -150,39 +380,62 @@ class Diagram():
         
     def motion_notify_event(self, event):
         # Mouse motion
-        self.rectangle_select_motion_notify_event(event)
+        # Just save the position; flush_motion() will handle it
+        #print(f'Motion: {event.x}, {event.y}')
+        self.pending_motion = (event.x, event.y)
+        if not self.motion_timer.isActive():
+            self.motion_timer.start()
+            
+    def flush_motion(self):
+        # Handle the latest mouse position since the last flush, if any
+        self.motion_timer.stop()
+        if not self.pending_motion:
+            return
+        x, y = self.pending_motion
+        self.pending_motion = None
+        
+        # Update the rectangle being drawn, if any
+        self.rectangle_select_motion(x, y)
         
         # If mouse button pressed, pan the figure
-        #print(f'Motion: {event.x}, {event.y}')
         if self.drag_position:
-            self.pan(
-                event.x - self.drag_position[0],
-                event.y - self.drag_position[1])
-            self.drag_position = (event.x, event.y)
+            self.pan(x - self.drag_position[0], y - self.drag_position[1])
+            self.drag_position = (x, y)
             
         # Update coordinates display
-        coords = self.convert_coords_canvas_to_game(event.x, event.y)
-        # Instead of "-z = 490.73", display "z = -490.73"
-        if self.status.axis_1.startswith('-'):
-            coord_1_str = f'{self.status.axis_1[1:]} = {-coords[0]:.3f}'
-        else:
-            coord_1_str = f'{self.status.axis_1} = {coords[0]:.3f}'
-        if self.status.axis_2.startswith('-'):
-            coord_2_str = f'{self.status.axis_2[1:]} = {-coords[1]:.3f}'
-        else:
-            coord_2_str = f'{self.status.axis_2} = {coords[1]:.3f}'
+        coords_state = (self.status.axis_1, self.status.axis_2)
+        if coords_state != self.previous_coords_state:
+            # Instead of "-z = 490.73", display "z = -490.73"
+            self.coords_format = (
+                coords_state[0].lstrip('-') + ' = {:.3f}, '
+                + coords_state[1].lstrip('-') + ' = {:.3f}')
+            self.coords_signs = [AXES[axis][1] for axis in coords_state]
+            self.previous_coords_state = coords_state
+        coords = self.convert_coords_canvas_to_game(x, y)
         
-        self.status.update_diagram_coords_text(f'{coord_1_str}, {coord_2_str}')
+        self.status.update_diagram_coords_text(self.coords_format.format(
+            coords[0]*self.coords_signs[0], coords[1]*self.coords_signs[1]))
             
     def scroll_event(self, event):
         # Mousewheel scrolling
         #print(f'Scroll: {event.x}, {event.y}, {event.step}')
         if event.step > 0:
             # Scroll up -> zoom in on the current mouse position
-            self.zoom_in(event.x, event.y)
+            self.pending_zoom_steps += 1
         else:
             # Scroll down -> zoom out from the current mouse position
-            self.zoom_out(event.x, event.y)
+            self.pending_zoom_steps -= 1
+        self.pending_zoom_position = (event.x, event.y)
+        if not self.scroll_timer.isActive():
+            self.scroll_timer.start()
+            
+    def flush_scroll(self):
+        # Apply the zoom steps scrolled since the last flush, if any
+        if self.pending_zoom_steps != 0:
+            x, y = self.pending_zoom_position
+            self.zoom(x, y, self.pending_zoom_steps)
+        self.pending_zoom_steps = 0
+        self.pending_zoom_position = None
             
     def key_press_event(self, event):
         #print(f'Key press: {event.key}')
@@ -203,33 +456,36 @@ class Diagram():
         #print(f'Resize: {event.width}, {event.height}')
         
         # Fix aspect ratio of the diagram.
-        axes_hmin, axes_hmax = self.axes.get_xlim()
-        axes_vmin, axes_vmax = self.axes.get_ylim()
-        hrange = axes_hmax - axes_hmin
-        vrange = axes_vmax - axes_vmin
-        
-        if hrange / vrange >= event.width / event.height:
-            # Add extra vertical range to maintain aspect ratio
-            target_vrange = hrange*(event.height / event.width)
-            extra_vspace_one_side = (target_vrange - vrange) / 2
-            axes_vmin = axes_vmin - extra_vspace_one_side
-            axes_vmax = axes_vmax + extra_vspace_one_side
-        else:
-            # Add extra horizontal range to maintain aspect ratio
-            target_hrange = vrange*(event.width / event.height)
-            extra_hspace_one_side = (target_hrange - hrange) / 2
-            axes_hmin = axes_hmin - extra_hspace_one_side
-            axes_hmax = axes_hmax + extra_hspace_one_side
-            
-        # Apply the new axes limits to fix the aspect ratio
-        self.axes.set_xlim(axes_hmin, axes_hmax)
-        self.axes.set_ylim(axes_vmin, axes_vmax)
+        xlim, ylim = fit_aspect(
+            self.axes.get_xlim(), self.axes.get_ylim(),
+            event.width, event.height)
+        self.axes.set_xlim(xlim)
+        self.axes.set_ylim(ylim)
         
         self.status.update_save_dimensions()
         
+        # The axes limits computed for the old canvas size no longer apply,
+        # and neither does the canvas to game coordinates conversion.
+        self.previous_setup_state = None
+        self.canvas_to_game = None
+        
+        # The saved background no longer fits the canvas. The canvas is
+        # redrawn after the resize, which saves a new background.
+        self.background = None
+        
         # Rectangle can get wonky after a canvas resize, so just erase it
         self.deactivate_rectangle_select()
         
+        # (Re)start the wait for the resizing to settle.
+        self.resizing = True
+        self.resize_timer.start()
+        
+    def finish_resize(self):
+        # No resizes for a while, so do a full draw, including the
+        # checkpoint numbers and saving the background.
+        self.resizing = False
+        self.canvas.draw_idle()
+        
             
     def pan(self, change_x, change_y):
         canvas_width, canvas_height = self.canvas.get_width_height()
@@ -246,22 +502,22 @@ class Diagram():
             ylim[0] - change_y*y_coord_ratio_game_to_canvas,
             ylim[1] - change_y*y_coord_ratio_game_to_canvas)
         
-        self.canvas.draw()
+        # Panning only moves the data artists around, so there's no need to
+        # redraw the whole canvas.
+        self.blit_data_artists()
         
         # print(f"Pan: {change_x}, {change_y}")
         # print(f"xlim: {self.axes.get_xlim()}")
         # print(f"ylim: {self.axes.get_ylim()}")
         
-    def zoom(self, x, y, direction_is_inward):
-        """Zoom in/out, centered on the current mouse position"""
+    def zoom(self, x, y, steps):
+        """
+        Zoom in/out, centered on the current mouse position.
+        Positive steps zoom in, negative steps zoom out.
+        """
         game_coords = self.convert_coords_canvas_to_game(x, y)
         
-        if direction_is_inward:
-            # Zoom in
-            space_stretch_factor = 1 / self.zoom_factor
-        else:
-            # Zoom out
-            space_stretch_factor = self.zoom_factor
+        space_stretch_factor = self.zoom_factor ** -steps
         
         xlim = self.axes.get_xlim()
         self.axes.set_xlim(
@@ -273,13 +529,14 @@ class Diagram():
             game_coords[1] - (game_coords[1] - ylim[0])*space_stretch_factor,
             game_coords[1] - (game_coords[1] - ylim[1])*space_stretch_factor)
         
-        self.canvas.draw()
+        # Like panning, zooming only changes where the data artists go.
+        self.blit_data_artists()
         
     def zoom_in(self, x, y):
-        self.zoom(x, y, True)
+        self.zoom(x, y, 1)
         
     def zoom_out(self, x, y):
-        self.zoom(x, y, False)
+        self.zoom(x, y, -1)
         
     def activate_rectangle_select(self):
         self.rect_rubberband.setGeometry(0, 0, 0, 0)
@@ -310,18 +567,19 @@ class Diagram():
         else:
             self.deactivate_rectangle_select()
             
-    def rectangle_select_motion_notify_event(self, event):
-        # Mouse motion
+    def rectangle_select_motion(self, x, y):
+        # Mouse motion (handled at most once per motion timer interval,
+        # since each setGeometry() call makes Qt repaint the rubberband)
         if self.rectangle_select_interaction == 'drawing':
             # Change the rectangle shape according to the mouse position.
             canvas_width, canvas_height = self.canvas.get_width_height()
             
             # If the mouse is outside of the canvas boundary, snap the
             # rectangle to the boundary
-            event_x_bounded = event.x
+            event_x_bounded = x
             event_x_bounded = max(event_x_bounded, 0)
             event_x_bounded = min(event_x_bounded, canvas_width)
-            event_y_bounded = event.y
+            event_y_bounded = y
             event_y_bounded = max(event_y_bounded, 0)
             event_y_bounded = min(event_y_bounded, canvas_height)
             
@@ -361,165 +619,282 @@ class Diagram():
             self.status.update_save_dimensions()
             #print(self.save_rectangle)
         
-    def draw_checkpoints(self):
+    def update_checkpoint_arrays(self):
+        # Get the checkpoint data's columns as separate arrays, so that
+        # positions can be computed for all checkpoints at once. This only
+        # needs to be done when the course changes.
+        # Coordinates are float32 (matplotlib converts to that for drawing
+        # anyway), and contiguous rather than strided views of the
+        # structured array, which halves the memory the computations touch.
+        checkpoints = self.status.checkpoints_np
+        self.cp_numbers = checkpoints['checkpoint']
+        self.cp_centers = np.ascontiguousarray(
+            checkpoints['center'], dtype=np.float32)
+        self.cp_rights = np.ascontiguousarray(
+            checkpoints['right'], dtype=np.float32)
+        self.cp_tw = np.ascontiguousarray(
+            checkpoints['track_width'], dtype=np.float32)
+        self.cp_colors = np.array(self.status.checkpoint_colors)
+        # Ensure the checkpoint number on the plot shows no decimal places
+        self.cp_number_texts = [str(n) for n in self.cp_numbers.tolist()]
+        
+        # Checkpoint positions need to be recomputed for the new data
+        self.previous_projection_state = None
+        
+    def update_path_arrays(self):
+        # Get path and crossing coordinates as arrays: (M,3) for the
+        # path's points, and (K,2,3) for the crossings' endpoints.
+        # Like the checkpoint arrays, these are float32. If there's no path
+        # or crossing data, the arrays are empty.
+        # Skip this if the data is the same as last time.
+        if self.status.data_path_points is not self.path_source:
+            self.path_source = self.status.data_path_points
+            self.path_version += 1
+            if self.status.data_path_points is None:
+                self.path_xyz = np.empty((0, 3), dtype=np.float32)
+            else:
+                self.path_xyz = np.ascontiguousarray(
+                    self.status.data_path_points, dtype=np.float32)
+        if self.status.crossing_data is not self.crossing_source:
+            self.crossing_source = self.status.crossing_data
+            self.crossing_version += 1
+            if self.status.crossing_data is None:
+                self.crossing_xyz = np.empty((0, 2, 3), dtype=np.float32)
+                self.crossing_success = np.empty(0, dtype=bool)
+            else:
+                self.crossing_xyz = np.ascontiguousarray(
+                    self.status.crossing_data['endpoints'], dtype=np.float32)
+                self.crossing_success = self.status.crossing_data['success']
+        
+    def compute_checkpoint_positions(self):
+        # Compute diagram positions of the checkpoint markers, extended
+        # lines, and numbers. These only depend on the checkpoint data, the
+        # axes, the extend length, and the number distance, so skip this if
+        # none of those have changed.
+        # (update_checkpoint_arrays() clears the previous state.)
+        projection_state = (
+            self.status.axis_1, self.status.axis_2,
+            self.status.extend_length, self.status.number_distance)
+        if projection_state == self.previous_projection_state:
+            return
+        self.previous_projection_state = projection_state
+        self.positions_version += 1
         
         # Prepare to plot checkpoints/paths on the chosen axes. The first will 
         # appear as the horizontal axis, and the second will appear as the 
         # vertical axis on the figure.
-        haxis = get_checkpoint_position_function(self.status.axis_1)
-        vaxis = get_checkpoint_position_function(self.status.axis_2)
-        haxis_point = get_point_position_function(self.status.axis_1)
-        vaxis_point = get_point_position_function(self.status.axis_2)
-        
-        # Track the farthest values on either axis so we can compute the
-        # display boundaries.
-        self.data_hmin = math.inf
-        self.data_hmax = -math.inf
-        self.data_vmin = math.inf
-        self.data_vmax = -math.inf
-        
-        # Draw the checkpoints.
-        for c in self.status.checkpoints:
-            
-            if c['checkpoint'] in self.status.hidden_checkpoints:
-                continue
-            
-            track_width = c['track_width']
-            half_track_width = track_width/2
-            
+        projection = PROJECTIONS[(self.status.axis_1, self.status.axis_2)]
+        self.projection = projection
+        
+        # Project the centers and right vectors once; everything below is
+        # then computed in the diagram's 2D coord plane.
+        centers_hv = project_points(self.cp_centers, projection)
+        rights_hv = project_points(self.cp_rights, projection)
+        half_track_widths = self.cp_tw / 2
+        
+        # Compute marker positions for all checkpoints: on the checkpoint's
+        # center, and on both edges of the track directly lateral from the
+        # checkpoint. markers is (N,3,2): checkpoint, marker, h/v coordinate.
+        marker_offsets = half_track_widths[:, None] * np.array(
+            [-1, 0, 1], dtype=np.float32)
+        markers = lateral_positions(centers_hv, rights_hv, marker_offsets)
+        self.markers = markers
+        
+        # Lengths of the (non-extended) checkpoint lines in the diagram's
+        # coord plane. (In 3D, the lengths are the half track widths.)
+        self.base_plane_lengths = half_track_widths * np.hypot(
+            rights_hv[:, 0], rights_hv[:, 1])
+        
+        # Extended lines for checkpoints, with equal line length on both
+        # sides. The line length is defined in the diagram's coord plane.
+        # If the line is perpendicular to the diagram's plane, the
+        # extended length is 0.
+        extended_3d_lengths = np.zeros_like(half_track_widths)
+        np.divide(
+            self.status.extend_length * half_track_widths,
+            self.base_plane_lengths,
+            out=extended_3d_lengths, where=self.base_plane_lengths > 0)
+        extend_offsets = extended_3d_lengths[:, None] * np.array(
+            [-1, 1], dtype=np.float32)
+        self.extend_segments = lateral_positions(
+            centers_hv, rights_hv, extend_offsets)
+        
+        # Positions for the checkpoint numbers.
+        # Position each number a certain distance away from one end
+        # of the (non-extended) checkpoint line.
+        # Negative distances put the number on the other side.
+        # Again, make sure to define distance in the diagram's coord plane.
+        if self.status.number_distance > 0:
+            side = 1
+            self.label_alignment = 'left'
+        else:
+            side = -1
+            self.label_alignment = 'right'
+        label_distances = self.status.number_distance + side*half_track_widths
+        label_3d_distances = np.zeros_like(half_track_widths)
+        np.divide(
+            label_distances * half_track_widths, self.base_plane_lengths,
+            out=label_3d_distances, where=self.base_plane_lengths != 0)
+        # Label positions of all checkpoints, whether their numbers are
+        # shown or not
+        self.all_label_positions = lateral_positions(
+            centers_hv, rights_hv, label_3d_distances[:, None])[:, 0, :]
+        
+    def draw_checkpoints(self):
+        
+        # Each part of the plot is only updated if something it depends on
+        # has changed since the last refresh. For example, changing the
+        # hidden numbers doesn't need to update the lines.
+        # (The checkpoint sets are arrays, so compare them by their bytes.)
+        hidden = self.status.hidden_checkpoints
+        plot_state = PlotState(
+            checkpoints=(self.positions_version, hidden.tobytes()),
+            extended=(
+                self.positions_version, hidden.tobytes(),
+                self.status.extended_checkpoints.tobytes()),
+            numbers=(
+                self.positions_version, hidden.tobytes(),
+                self.status.hidden_numbers.tobytes(),
+                self.status.number_size),
+            path=(self.positions_version, self.path_version),
+            crossings=(self.positions_version, self.crossing_version),
+        )
+        previous = self.previous_plot_state or PlotState(
+            None, None, None, None, None)
+        self.previous_plot_state = plot_state
+        
+        projection = self.projection
+        markers = self.markers
+        
+        # Which checkpoints get lines, extended lines, and numbers.
+        numbers = self.cp_numbers
+        shown = ~checkpoint_mask(numbers, hidden)
+        
+        if plot_state.checkpoints != previous.checkpoints:
+            # Draw the checkpoint lines, all in one artist. Each line goes
+            # between the two track edges, so it passes through the center.
+            # Segments are (N,2,2): checkpoint, line end, h/v coordinate.
+            segments = markers[:, [0, 2], :]
+            self.checkpoint_lines.set_segments(segments[shown])
+            self.checkpoint_lines.set_color(self.cp_colors[shown])
             # Draw markers on the checkpoint's center, and on both edges 
             # of the track directly lateral from the checkpoint.
-            # http://stackoverflow.com/a/8409110
-            haxis_coords = [
-                haxis(-half_track_width, c),
-                haxis(0, c),
-                haxis(half_track_width, c)]
-            vaxis_coords = [
-                vaxis(-half_track_width, c),
-                vaxis(0, c),
-                vaxis(half_track_width, c)]
+            self.checkpoint_markers.set_offsets(markers[shown].reshape(-1, 2))
+            self.checkpoint_markers.set_facecolor(
+                np.repeat(self.cp_colors[shown], 3))
+        
+        if plot_state.extended != previous.extended:
+            # Draw extended checkpoint lines, again all in one artist.
+            extended = shown & checkpoint_mask(
+                numbers, self.status.extended_checkpoints)
+            self.extended_lines.set_segments(self.extend_segments[extended])
+            self.extended_lines.set_color(self.cp_colors[extended])
+        
+        if plot_state.numbers != previous.numbers:
+            labeled = shown & ~checkpoint_mask(
+                numbers, self.status.hidden_numbers)
+            self.draw_numbers(labeled)
             
-            self.axes.plot(
-                haxis_coords, vaxis_coords, color=c['color'], marker='o')
+        if (plot_state.checkpoints != previous.checkpoints
+                or plot_state.numbers != previous.numbers):
+            self.compute_data_bounds(shown)
             
-            base_3d_length = half_track_width
-            base_plane_length = math.sqrt(
-                (haxis_coords[1]-haxis_coords[0])**2
-                + (vaxis_coords[1]-vaxis_coords[0])**2)
+        # Plot the path, if any.
+        if plot_state.path != previous.path:
+            path_hv = project_points(self.path_xyz, projection)
+            self.path_line.set_data(path_hv[:, 0], path_hv[:, 1])
             
-            if c['checkpoint'] in self.status.extended_checkpoints:
-                # Draw an extended line for the checkpoint,
-                # with equal line length on both sides.
-                # The line length is defined in the diagram's coord plane.
-                extended_plane_length = self.status.extend_length
-                if base_plane_length > 0:
-                    extended_3d_length = (extended_plane_length
-                        * (base_3d_length / base_plane_length))
-                else:
-                    # In this case the line is perpendicular to the
-                    # diagram's plane.
-                    extended_3d_length = 0
-                
-                extend_haxis_coords = [
-                    haxis(-extended_3d_length, c),
-                    haxis(extended_3d_length, c)]
-                extend_vaxis_coords = [
-                    vaxis(-extended_3d_length, c),
-                    vaxis(extended_3d_length, c)]
-                self.axes.plot(
-                    extend_haxis_coords, extend_vaxis_coords, c['color'])
+        # Plot crossing data, if any.
+        if plot_state.crossings != previous.crossings:
+            # (K,2,2): crossing, endpoint, h/v coordinate
+            segments = project_points(self.crossing_xyz, projection)
+            success = self.crossing_success
             
-            # Label the checkpoint with its checkpoint number.
-            # Position the label a certain distance away from one end
-            # of the (non-extended) checkpoint line.
-            # Negative distances put the number on the other side.
-            # Again, make sure to define distance in the diagram's coord plane.
-            if c['checkpoint'] not in self.status.hidden_numbers:
-                if self.status.number_distance > 0:
-                    label_distance = (
-                        self.status.number_distance + half_track_width)
-                    side_track_is_on = 'left'
-                else:
-                    label_distance = (
-                        self.status.number_distance - half_track_width)
-                    side_track_is_on = 'right'
-                    
-                if base_plane_length > 0 or base_plane_length < 0:
-                    label_3d_distance = (label_distance
-                        * (base_3d_length / base_plane_length))
-                else:
-                    label_3d_distance = 0
-                label_coords = (
-                    haxis(label_3d_distance, c), vaxis(label_3d_distance, c))
-                self.axes.text(
-                    label_coords[0], label_coords[1],
-                    # Ensure the checkpoint number on the plot
-                    # shows no decimal places
-                    int(c['checkpoint']),
-                    fontdict=dict(
-                        # Number color should match the line color
-                        color=c['color'],
-                        # Font size
-                        size=self.status.number_size,
-                        # Base the position on the side of the text, not the
-                        # center. This way, 1 digit and 3 digit numbers
-                        # are the same distance from the side of the track.
-                        # And it generally reduces instances where the text is
-                        # struck-through by extended checkpoint lines.
-                        horizontalalignment=side_track_is_on,
-                        # Put the bottom of the text at this position.
-                        # This generally reduces instances where the text is
-                        # struck-through by extended checkpoint lines.
-                        verticalalignment='bottom',
-                    ),
-                )
-                
-                # Update coordinate boundaries to ensure they contain the
-                # checkpoint numbers.
-                self.data_hmin = min([self.data_hmin, label_coords[0]])
-                self.data_hmax = max([self.data_hmax, label_coords[0]])
-                self.data_vmin = min([self.data_vmin, label_coords[1]])
-                self.data_vmax = max([self.data_vmax, label_coords[1]])
+            # Add line segments. Failure = gray, success = black.
+            # Successes go on top.
+            self.crossing_fail_lines.set_segments(segments[~success])
+            self.crossing_success_lines.set_segments(segments[success])
             
-            # Update coordinate boundaries to ensure they contain the
-            # (non-extended) checkpoint lines.
-            self.data_hmin = min([self.data_hmin] + haxis_coords)
-            self.data_hmax = max([self.data_hmax] + haxis_coords)
-            self.data_vmin = min([self.data_vmin] + vaxis_coords)
-            self.data_vmax = max([self.data_vmax] + vaxis_coords)
+            # Add dot markers on both ends of each segment.
+            self.crossing_markers.set_offsets(segments.reshape(-1, 2))
+            self.crossing_markers.set_facecolor(
+                np.repeat(np.where(success, BLACK_HEX, GRAY_HEX), 2))
             
-        # Plot the path, if any.
-        if self.status.data_path_points:
-            haxis_coords = [
-                haxis_point(p) for p in self.status.data_path_points]
-            vaxis_coords = [
-                vaxis_point(p) for p in self.status.data_path_points]
-            # Plot in black.
-            color = rgb2hex(hsv_to_rgb([0, 0, 0.0]))
-            self.axes.plot(haxis_coords, vaxis_coords, color)
+    def draw_numbers(self, labeled):
+        # Label the checkpoints with their checkpoint numbers.
+        labeled_indices = np.flatnonzero(labeled)
+        self.shown_label_positions = (
+            self.all_label_positions[labeled_indices])
+        
+        for label_index, i in enumerate(labeled_indices):
             
-        # Plot crossing data, if any.
-        if self.status.crossing_data:
-            for c in self.status.crossing_data:
-                if c['success'] == "Y":
-                    # Success = black
-                    color = rgb2hex(hsv_to_rgb([0, 0, 0.0]))
-                else:
-                    # Failure = gray
-                    color = rgb2hex(hsv_to_rgb([0, 0, 0.6]))
-                
-                # Add line segments.
-                p1 = dict(x=c['x1'], y=c['y1'], z=c['z1'])
-                p2 = dict(x=c['x2'], y=c['y2'], z=c['z2'])
-                haxis_coords = [haxis_point(p1), haxis_point(p2)]
-                vaxis_coords = [vaxis_point(p1), vaxis_point(p2)]
-                self.axes.plot(haxis_coords, vaxis_coords, color)
+            # Reuse a text artist from previous refreshes if there's
+            # one available, since creating them is relatively slow.
+            if label_index < len(self.label_texts):
+                text = self.label_texts[label_index]
+            else:
+                # Put the bottom of the text at the number's position.
+                # This generally reduces instances where the text is
+                # struck-through by extended checkpoint lines.
+                text = self.axes.text(
+                    0, 0, '', verticalalignment='bottom', animated=True)
+                self.label_texts.append(text)
                 
-                # Add dot markers.
-                self.axes.plot(haxis_coords, vaxis_coords, color, marker='o')
+            text.set_position(self.shown_label_positions[label_index])
+            text.set_text(self.cp_number_texts[i])
+            # Number color should match the line color
+            text.set_color(self.cp_colors[i])
+            text.set_fontsize(self.status.number_size)
+            # Base the position on the side of the text, not the
+            # center. This way, 1 digit and 3 digit numbers
+            # are the same distance from the side of the track.
+            # And it generally reduces instances where the text is
+            # struck-through by extended checkpoint lines.
+            text.set_horizontalalignment(self.label_alignment)
+            text.set_visible(True)
+            
+        # Hide the text artists we didn't need this time
+        for text in self.label_texts[len(self.shown_label_positions):]:
+            text.set_visible(False)
             
+    def compute_data_bounds(self, shown):
+        # Compute coordinate boundaries which contain the (non-extended)
+        # checkpoint lines and the checkpoint numbers.
+        marker_h = self.markers[:, :, 0]
+        marker_v = self.markers[:, :, 1]
+        all_h = np.concatenate(
+            [marker_h[shown].ravel(), self.shown_label_positions[:, 0]])
+        all_v = np.concatenate(
+            [marker_v[shown].ravel(), self.shown_label_positions[:, 1]])
+        if all_h.size == 0:
+            # All checkpoints are hidden. Use the hidden checkpoints'
+            # boundaries, so that the diagram still has sensible limits.
+            all_h = marker_h.ravel()
+            all_v = marker_v.ravel()
+        self.data_hmin = float(all_h.min())
+        self.data_hmax = float(all_h.max())
+        self.data_vmin = float(all_v.min())
+        self.data_vmax = float(all_v.max())
+        
+    def create_markers(self):
+        # Circle markers, sized like plot(marker='o') would draw them.
+        return self.axes.scatter(
+            [], [], s=rcParams['lines.markersize']**2,
+            linewidths=rcParams['lines.markeredgewidth'], zorder=DATA_ZORDER,
+            animated=True)
         
     def setup_figure(self):
+        # If the DPI, canvas size, and data boundaries are the same as last
+        # time, then the result is the same too, so just reuse it.
+        canvas_width, canvas_height = self.canvas.get_width_height()
+        setup_state = (
+            self.status.dpi, canvas_width, canvas_height,
+            self.data_hmin, self.data_hmax, self.data_vmin, self.data_vmax)
+        if setup_state == self.previous_setup_state:
+            self.axes.set_xlim(self.previous_setup_limits[0])
+            self.axes.set_ylim(self.previous_setup_limits[1])
+            return
+        
         # Set the desired DPI.
         self.figure.set_dpi(self.status.dpi)
         
@@ -546,28 +921,21 @@ class Diagram():
             self.data_vmin - (self.data_vmax - self.data_vmin)*margin_factor)
         axes_vmax = (
             self.data_vmax + (self.data_vmax - self.data_vmin)*margin_factor)
-        hrange = axes_hmax - axes_hmin
-        vrange = axes_vmax - axes_vmin
         
         # Expand one dimension as needed to fill the canvas while maintaining
         # aspect ratio.
-        canvas_width, canvas_height = self.canvas.get_width_height()
-        if hrange / vrange >= canvas_width / canvas_height:
-            # Add extra vertical range to maintain aspect ratio
-            target_vrange = hrange*(canvas_height / canvas_width)
-            extra_vspace_one_side = (target_vrange - vrange) / 2
-            axes_vmin = axes_vmin - extra_vspace_one_side
-            axes_vmax = axes_vmax + extra_vspace_one_side
-        else:
-            # Add extra horizontal range to maintain aspect ratio
-            target_hrange = vrange*(canvas_width / canvas_height)
-            extra_hspace_one_side = (target_hrange - hrange) / 2
-            axes_hmin = axes_hmin - extra_hspace_one_side
-            axes_hmax = axes_hmax + extra_hspace_one_side
+        # The canvas size doesn't change from the DPI update above, since
+        # the figure inches were adjusted to compensate.
+        xlim, ylim = fit_aspect(
+            (axes_hmin, axes_hmax), (axes_vmin, axes_vmax),
+            canvas_width, canvas_height)
             
         # Apply the axes limits.
-        self.axes.set_xlim(axes_hmin, axes_hmax)
-        self.axes.set_ylim(axes_vmin, axes_vmax)
+        self.axes.set_xlim(xlim)
+        self.axes.set_ylim(ylim)
+        
+        self.previous_setup_state = setup_state
+        self.previous_setup_limits = (xlim, ylim)
         
         # Debug info
         # print(f"canvas size: {canvas_width}, {canvas_height}")
@@ -575,7 +943,7 @@ class Diagram():
         # print(
         #     f"data ranges: {self.data_hmin:.3f}~{self.data_hmax:.3f}"
         #     f" {self.data_vmin:.3f}~{self.data_vmax:.3f}")
-        # print(f"axes range sizes: {hrange}, {vrange}")
+        # print(f"axes range sizes: {xlim[1]-xlim[0]}, {ylim[1]-ylim[0]}")
         # print(f"xlim: {self.axes.get_xlim()}")
         # print(f"ylim: {self.axes.get_ylim()}")
         
@@ -599,18 +967,26 @@ class Diagram():
     def save(self, filepath):
         if self.save_rectangle:
             # We've specified a specific region of the diagram to save.
-            dpi = self.status.dpi
-            # save_rectangle is in canvas pixels; need to convert to inches
-            bbox_inches = Bbox([
-                (min(self.save_rectangle[0][0], self.save_rectangle[1][0])/dpi,
-                min(self.save_rectangle[0][1], self.save_rectangle[1][1])/dpi),
-                (max(self.save_rectangle[0][0], self.save_rectangle[1][0])/dpi,
-                max(self.save_rectangle[0][1], self.save_rectangle[1][1])/dpi),
-            ])
+            # save_rectangle is in canvas pixels.
+            save_region = Bbox.from_extents(
+                min(self.save_rectangle[0][0], self.save_rectangle[1][0]),
+                min(self.save_rectangle[0][1], self.save_rectangle[1][1]),
+                max(self.save_rectangle[0][0], self.save_rectangle[1][0]),
+                max(self.save_rectangle[0][1], self.save_rectangle[1][1]))
+            # Need to convert to inches for savefig()
+            bbox_inches = save_region.transformed(
+                Affine2D().scale(1 / self.status.dpi))
         else:
             # Save the whole diagram.
+            save_region = None
             bbox_inches = None
             
+        if self.save_from_canvas(filepath, save_region):
+            return
+            
+        # Checkpoint numbers outside of the saved region don't need to be
+        # drawn. (The next on-screen draw culls to the view again.)
+        self.cull_labels(save_region)
         self.figure.savefig(
             filepath,
             # Force PNG format; JPEG is not supported by our MPL backend
@@ -622,4 +998,29 @@ class Diagram():
             dpi=self.status.save_dpi,
             bbox_inches=bbox_inches,
         )
+        
+    def save_from_canvas(self, filepath, save_region):
+        # When saving at the diagram's DPI, the canvas already has the image
+        # we want, so just write out its pixels instead of rendering the
+        # whole figure again. Returns False if this isn't possible.
+        if self.status.save_dpi != self.status.dpi:
+            return False
+        if self.background is None or self.resizing:
+            # The canvas isn't fully drawn yet
+            return False
+        pixels = np.asarray(self.canvas.buffer_rgba())
+        canvas_width, canvas_height = self.canvas.get_width_height()
+        if pixels.shape[:2] != (canvas_height, canvas_width):
+            # Screen scaling is in effect, so the canvas has a different
+            # number of pixels than a save at this DPI would
+            return False
+        
+        if save_region:
+            # Pixel rows go from top to bottom, while canvas y coordinates
+            # go from bottom to top.
+            x0, y0, x1, y1 = [round(n) for n in save_region.extents]
+            pixels = pixels[canvas_height-y1:canvas_height-y0, x0:x1]
+        # Same DPI metadata as savefig() would write
+        imsave(filepath, pixels, format='png', dpi=self.status.save_dpi)
+        return True
 
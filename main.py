@@ -3,17 +3,20 @@
 # Requirements:
 # Python 3.6+ (for f-strings)
 # pip install matplotlib (tested with 2.0.2)
+# pip install numpy
 # pip install PyQt5
 
+from collections import namedtuple, OrderedDict
 import csv
-import os
+from functools import lru_cache
 from pathlib import Path
 import re
 import sys
 
-from matplotlib.colors import hsv_to_rgb, rgb2hex
+from matplotlib.colors import hsv_to_rgb
+import numpy as np
 
-from PyQt5.QtCore import pyqtSignal, QObject
+from PyQt5.QtCore import pyqtSignal, QObject, QThread
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import (QCheckBox, QComboBox, QWidget, QLabel, QLineEdit,
     QPushButton, QHBoxLayout, QVBoxLayout, QFileDialog, QApplication)
@@ -21,50 +24,137 @@ from PyQt5.QtWidgets import (QCheckBox, QComboBox, QWidget, QLabel, QLineEdit,
 from diagram import Diagram
 
 
+# Highest checkpoint number that checkpoint sets (such as the hidden
+# checkpoints) can contain
+MAX_CHECKPOINT_NUMBER = 999
+
+# A checkpoint set is comma-separated numbers and ranges, such as
+# 0,2-5,177-193. The first regex checks the whole string, and the second
+# finds each number or range in it.
+CHECKPOINT_SET_REGEX = re.compile(
+    r'\s*\d+\s*(-\s*\d+\s*)?(,\s*\d+\s*(-\s*\d+\s*)?)*')
+CHECKPOINT_RANGE_REGEX = re.compile(r'(\d+)\s*(?:-\s*(\d+))?')
+
+# Data filenames. Course data files are named like MCTR.csv, and data path
+# files are named like MCTR_skip_success.csv.
+COURSE_DATA_FILE_REGEX = re.compile(r'([A-Z0-9]+)\.csv')
+PATH_DATA_FILE_REGEX = re.compile(r'([A-Z0-9]+)_([A-Za-z0-9_]+)\.csv')
+
+# Success/failure data of crossings for all courses
+CROSSINGS_CSV_FILEPATH = Path('data', 'Crossings.csv')
+
+# Numeric checkpoint data, one record per checkpoint
+CHECKPOINT_DTYPE = np.dtype([
+    ('center', np.float64, 3),
+    ('right', np.float64, 3),
+    ('track_width', np.float64),
+    ('checkpoint', np.int32),
+])
+
+# Numeric crossing data, one record per crossing
+CROSSING_DTYPE = np.dtype([
+    # Start and end points, each x,y,z
+    ('endpoints', np.float64, (2, 3)),
+    ('success', bool),
+])
+
+
+@lru_cache(maxsize=16)
 def parse_checkpoint_set(checkpoint_set_str):
-    """Example: 0,2-5,177-193"""
+    """
+    Example: 0,2-5,177-193
+    Returns a boolean array indexed by checkpoint number, which is True
+    for the checkpoints in the set. This way, the diagram can look up all
+    of its checkpoints at once.
+    Results are cached, since the fields usually don't change between
+    diagram updates. So the returned array is read-only.
+    """
+    checkpoint_set = np.zeros(MAX_CHECKPOINT_NUMBER + 1, dtype=bool)
     if checkpoint_set_str == '':
-        return set()
+        checkpoint_set.flags.writeable = False
+        return checkpoint_set
     
-    checkpoint_set = set()
-    range_strs = checkpoint_set_str.split(',')
-    for range_str in range_strs:
-        range_str = range_str.strip()
-        if '-' in range_str:
+    if not CHECKPOINT_SET_REGEX.fullmatch(checkpoint_set_str):
+        raise ValueError(f"Invalid checkpoint set: {checkpoint_set_str}")
+    
+    for match in CHECKPOINT_RANGE_REGEX.finditer(checkpoint_set_str):
+        low_str, high_str = match.groups()
+        if high_str:
             # A range.
-            low, high = range_str.split('-')
             # Limit the range within 0 and 999 to prevent silly
             # hangups from accidentally entering high numbers.
-            low = max(int(low), 0)
-            high = min(int(high), 999)
-            checkpoint_set.update(range(low, high+1))
+            # (The regex only matches non-negative numbers.)
+            low = int(low_str)
+            high = min(int(high_str), MAX_CHECKPOINT_NUMBER)
+            checkpoint_set[low:high+1] = True
         else:
             # Just a number
-            checkpoint_set.add(int(range_str))
+            number = int(low_str)
+            if number <= MAX_CHECKPOINT_NUMBER:
+                checkpoint_set[number] = True
             
+    checkpoint_set.flags.writeable = False
     return checkpoint_set
     
 
-def add_checkpoint_colors(checkpoints):
+@lru_cache(maxsize=32)
+def checkpoint_color_ramp(num_checkpoints):
+    """Tuple of hex colors for a course with this many checkpoints"""
     # Different color for each line, and the colors should be
     # evenly spaced from say, red to blue to medium-green. Use HSV.
-    # Assign the colors in order of checkpoint number.
-    start_color = [0.33, 1.0, 0.7]
-    end_color = [1.0, 1.0, 1.0]
-    num_checkpoints = len(checkpoints)
+    start_color = np.array([0.33, 1.0, 0.7])
+    end_color = np.array([1.0, 1.0, 1.0])
     
-    for index, c in enumerate(checkpoints):
-        num = index + 1
-        interpolation = num / num_checkpoints
-        h = start_color[0] + \
-            (end_color[0] - start_color[0])*interpolation
-        s = start_color[1] + \
-            (end_color[1] - start_color[1])*interpolation
-        v = start_color[2] + \
-            (end_color[2] - start_color[2])*interpolation
-        checkpoints[index]['color'] = rgb2hex(hsv_to_rgb([h,s,v]))
-        
-    return checkpoints
+    # Interpolate all the HSV colors at once: an (N,3) array, with one
+    # row per checkpoint. The Nth checkpoint gets the end color.
+    interpolations = np.arange(1, num_checkpoints+1) / num_checkpoints
+    hsv_colors = (
+        start_color + (end_color - start_color)*interpolations[:, None])
+    rgb_colors = hsv_to_rgb(hsv_colors)
+    
+    # Convert to 0-255 values all at once too, and only do the string
+    # formatting per color. (Rounding matches matplotlib's rgb2hex.)
+    rgb_bytes = np.rint(rgb_colors * 255).astype(np.int32).tolist()
+    return tuple('#%02x%02x%02x' % tuple(rgb) for rgb in rgb_bytes)
+    
+
+def read_csv_columns(csv_filepath):
+    """
+    Read a CSV file column by column. Returns a dict from column name to a
+    list of that column's values (as strings).
+    Raises IOError if the file can't be read, or ValueError if a row has
+    more fields than there are column names.
+    """
+    # The csv module does its own newline handling, so the file shouldn't.
+    with open(csv_filepath, 'r', newline='', encoding='utf-8') as csv_file:
+        csv_reader = csv.reader(csv_file)
+        
+        # Get the column names (first row). Convert to lowercase and replace
+        # spaces with underscores.
+        column_names = next(csv_reader)
+        dict_labels = [n.lower().replace(' ', '_') for n in column_names]
+        
+        # Get data from the rest of the rows. Ignore empty rows.
+        rows = [row for row in csv_reader if row and row[0]]
+    
+    # Spreadsheet exports can leave off trailing empty cells, so pad short
+    # rows with empty values. Otherwise, zip() below would cut every column
+    # down to the shortest row.
+    num_columns = len(dict_labels)
+    if any(len(row) != num_columns for row in rows):
+        for row in rows:
+            if len(row) > num_columns:
+                raise ValueError(
+                    f"{csv_filepath} has a row with {len(row)} fields, but"
+                    f" only {num_columns} column names: {row}")
+            row.extend([''] * (num_columns - len(row)))
+    
+    # Transpose the rows into columns.
+    if rows:
+        columns = [list(column) for column in zip(*rows)]
+    else:
+        columns = [[] for _ in dict_labels]
+    return dict(zip(dict_labels, columns))
     
     
 class Status():
@@ -83,7 +173,11 @@ class Status():
         
         self.course_code = None
         self.course_code_changed = False
-        self.checkpoints = None
+        # Whether the latest data read got new checkpoint data, meaning the
+        # diagram has to be set up for a new course
+        self.checkpoints_changed = False
+        self.checkpoints_np = None
+        self.checkpoint_colors = None
         self.data_path_points = None
         
     @property
@@ -168,13 +262,201 @@ class Status():
         self.main_widget.coords_label.setText(text)
 
 
+# What the DataReader should read for a diagram update
+DataRequest = namedtuple(
+    'DataRequest',
+    ['course_code', 'read_checkpoints', 'data_path_name', 'read_crossings'])
+
+
+class DataReader(QObject):
+    """
+    Reads course data from the CSV files in /data.
+    
+    This lives in a worker thread, so that the GUI stays responsive while
+    large files are parsed. Requests come in through read(), and the data
+    goes back to the GUI thread through the finished signal: the request,
+    a dict of Status attributes to set, and an error message ('' if none).
+    """
+    finished = pyqtSignal(object, object, str)
+    
+    def __init__(self):
+        super().__init__()
+        
+        # Checkpoint data of recently read courses, least recently used
+        # first. This makes switching back to a course faster.
+        self.checkpoints_cache = OrderedDict()
+        self.checkpoints_cache_size = 8
+        
+        # Columns of the crossings file, and the file's modified time when
+        # it was read.
+        self.crossings_cache = None
+        
+        
+    def read(self, request):
+        # If a path or crossings can't be read, show none rather than
+        # keeping the previous ones, which may be from another course.
+        self.data = dict(data_path_points=None, crossing_data=None)
+        self.error_text = ""
+        
+        # The GUI thread waits for the finished signal (with the Update
+        # button disabled), so it must be sent even if reading fails, such
+        # as when a file has a malformed number.
+        try:
+            if request.read_checkpoints:
+                self.read_checkpoints(request.course_code)
+                
+            if request.data_path_name:
+                self.read_data_path(
+                    request.course_code, request.data_path_name)
+                
+            if request.read_crossings:
+                self.read_crossing_data(request.course_code)
+        except Exception as e:
+            self.error_text = f"There was a problem reading the data: {e}"
+        finally:
+            self.finished.emit(request, self.data, self.error_text)
+        
+        
+    def read_checkpoints(self, course_code):
+        
+        csv_filepath = Path('data', f'{course_code}.csv')
+        
+        # Reuse the data from a previous read, as long as the file hasn't
+        # been modified since then.
+        try:
+            modified_time = csv_filepath.stat().st_mtime
+        except OSError:
+            modified_time = None
+        cached = self.checkpoints_cache.get(course_code)
+        if cached and cached[0] == modified_time:
+            self.checkpoints_cache.move_to_end(course_code)
+            _, checkpoints, checkpoint_colors = cached
+            self.data['checkpoints_np'] = checkpoints
+            self.data['checkpoint_colors'] = checkpoint_colors
+            return
+        
+        try:
+            columns = read_csv_columns(csv_filepath)
+        except IOError as e:
+            self.error_text = (
+                f"There was a problem trying to read {csv_filepath}: {e}")
+            return
+        num_checkpoints = len(columns['checkpoint'])
+        
+        # Store the numeric data as a structured array, converting each
+        # column from strings in one go. This way, the diagram can compute
+        # positions for all checkpoints at once.
+        checkpoints = np.empty(num_checkpoints, dtype=CHECKPOINT_DTYPE)
+        checkpoints['checkpoint'] = np.array(
+            columns['checkpoint'], dtype=np.int32)
+        checkpoints['center'] = np.array(
+            [columns['center_x'], columns['center_y'], columns['center_z']],
+            dtype=np.float64).T
+        checkpoints['right'] = np.array(
+            [columns['right_x'], columns['right_y'], columns['right_z']],
+            dtype=np.float64).T
+            
+        # Take care of the track width.
+        # If both track width and true width are unspecified, use a default.
+        checkpoints['track_width'] = 90.0
+        # Use the normal track width stat if true width isn't specified.
+        # True width is only specified for pipes, which make the normal
+        # track width stat inaccurate.
+        for column_name in ['track_width', 'true_width']:
+            if column_name not in columns:
+                continue
+            values = np.array(columns[column_name])
+            specified = values != ''
+            checkpoints['track_width'][specified] = (
+                values[specified].astype(np.float64))
+        self.data['checkpoints_np'] = checkpoints
+        
+        # Associate each checkpoint with a color, in order of checkpoint
+        # number. The colors go in a parallel list.
+        checkpoint_colors = list(checkpoint_color_ramp(num_checkpoints))
+        self.data['checkpoint_colors'] = checkpoint_colors
+        
+        self.checkpoints_cache[course_code] = (
+            modified_time, checkpoints, checkpoint_colors)
+        self.checkpoints_cache.move_to_end(course_code)
+        if len(self.checkpoints_cache) > self.checkpoints_cache_size:
+            self.checkpoints_cache.popitem(last=False)
+        
+        
+    def read_data_path(self, course_code, data_path_name):
+        csv_filepath = Path('data', f'{course_code}_{data_path_name}.csv')
+        try:
+            columns = read_csv_columns(csv_filepath)
+        except IOError as e:
+            self.error_text = (
+                f"There was a problem trying to read {csv_filepath}: {e}")
+            return
+        
+        # Path points as an (M,3) array: point, x/y/z coordinate.
+        self.data['data_path_points'] = np.array(
+            [columns['x'], columns['y'], columns['z']], dtype=np.float64).T
+            
+            
+    def read_crossing_columns(self):
+        """
+        Returns the crossings file's columns, as from read_csv_columns().
+        The file is only parsed again if it's been modified.
+        Raises IOError if the file can't be read, or ValueError if it
+        doesn't have the expected format.
+        
+        This is also called from the GUI thread (to see which courses have
+        crossing data). The cache is a single tuple which is read and
+        replaced as a whole, so the threads don't need to coordinate.
+        """
+        try:
+            modified_time = CROSSINGS_CSV_FILEPATH.stat().st_mtime
+        except OSError:
+            modified_time = None
+        cached = self.crossings_cache
+        if cached and cached[0] == modified_time:
+            return cached[1]
+        
+        columns = read_csv_columns(CROSSINGS_CSV_FILEPATH)
+        self.crossings_cache = (modified_time, columns)
+        return columns
+        
+        
+    def read_crossing_data(self, course_code):
+        try:
+            columns = self.read_crossing_columns()
+        except IOError as e:
+            self.error_text = (
+                "There was a problem trying to read"
+                f" {CROSSINGS_CSV_FILEPATH}: {e}")
+            return
+        
+        # Filter so that we only have data for the current course. Only
+        # these rows' numbers are converted, so a bad value elsewhere in
+        # the file doesn't affect this course.
+        in_course = np.array(columns['track']) == course_code
+        
+        # Store the numeric data as a structured array.
+        crossings = np.empty(np.count_nonzero(in_course), dtype=CROSSING_DTYPE)
+        start_points = np.array(
+            [columns['x1'], columns['y1'], columns['z1']])[:, in_course]
+        end_points = np.array(
+            [columns['x2'], columns['y2'], columns['z2']])[:, in_course]
+        crossings['endpoints'][:, 0, :] = start_points.T.astype(np.float64)
+        crossings['endpoints'][:, 1, :] = end_points.T.astype(np.float64)
+        crossings['success'] = np.array(columns['success'])[in_course] == "Y"
+        self.data['crossing_data'] = crossings
+
+
 class MainWidget(QWidget):
     
+    # Sent to the DataReader in the worker thread
+    data_read_requested = pyqtSignal(object)
+    
     def __init__(self):
         super().__init__()
         
         # Set to True for debugging, False otherwise (for responsiveness)
-        self.synchronous_signals = True
+        self.synchronous_signals = False
         if self.synchronous_signals:
             self.signal_type = Qt.AutoConnection
         else:
@@ -183,6 +465,16 @@ class MainWidget(QWidget):
         self.diagram = Diagram()
         self.status = Status(self, self.diagram)
         
+        # Read CSV data in a worker thread. Signals between the threads are
+        # queued, so on_data_read() runs in the GUI thread.
+        self.data_reader = DataReader()
+        self.data_thread = QThread()
+        self.data_reader.moveToThread(self.data_thread)
+        self.data_read_requested.connect(self.data_reader.read)
+        self.data_reader.finished.connect(self.on_data_read)
+        self.data_thread.start()
+        QApplication.instance().aboutToQuit.connect(self.stop_data_thread)
+        
         self.init_ui()
         
         
@@ -200,7 +492,8 @@ class MainWidget(QWidget):
         hbox.addWidget(label)
         self.course_combo_box = QComboBox()
         self.course_combo_box.addItem("Select course")
-        self.add_course_codes()
+        self.scan_data_dir()
+        self.course_combo_box.addItems(self.course_codes)
         self.course_combo_box.currentTextChanged.connect(
             self.on_course_code_change, self.signal_type)
         hbox.addWidget(self.course_combo_box)
@@ -478,177 +771,87 @@ class MainWidget(QWidget):
         self.error_label.setText("")
         
         self.update_diagram_fields()
-        if self.status.course_code_changed and self.status.course_code:
-            self.read_checkpoints()
-            
-        if self.status.data_path_name:
-            self.read_data_path()
-        else:
-            self.status.data_path_points = None
-            
-        if (self.crossings_checkbox.isEnabled() and
-           self.crossings_checkbox.isChecked()):
-            self.read_crossing_data()
-        else:
-            self.status.crossing_data = None
-            
-        self.diagram.refresh()
+        
+        # Read the data in the worker thread. The diagram is refreshed once
+        # the data comes back.
+        self.update_button.setEnabled(False)
+        self.data_read_requested.emit(DataRequest(
+            course_code=self.status.course_code,
+            read_checkpoints=(
+                self.status.course_code_changed
+                and bool(self.status.course_code)),
+            data_path_name=self.status.data_path_name,
+            read_crossings=(
+                self.crossings_checkbox.isEnabled()
+                and self.crossings_checkbox.isChecked()),
+        ))
         
         self.status.course_code_changed = False
         
         
-    def add_course_codes(self):
-        # Look in /data for csv files whose names consists of all capital
-        # letters and numbers. For example: MCTR, SOSS, CH3
-        data_filenames = os.listdir(Path('data'))
-        course_data_file_regex = re.compile('([A-Z0-9]+)\.csv')
+    def on_data_read(self, request, data, error_text):
+        for name, value in data.items():
+            setattr(self.status, name, value)
+        self.status.checkpoints_changed = 'checkpoints_np' in data
         
-        for filename in data_filenames:
-            match = re.fullmatch(course_data_file_regex, filename)
-            if match:
-                course_code = match.groups()[0]
-                self.course_combo_box.addItem(course_code)
-                
-                
-    def read_checkpoints(self):
+        # If the course's checkpoints couldn't be read, try again on the
+        # next update (unless the course has changed since, in which case
+        # it's getting read anyway).
+        if (request.read_checkpoints and not self.status.checkpoints_changed
+                and request.course_code == self.status.course_code):
+            self.status.course_code_changed = True
+        if error_text:
+            self.error_label.setText(error_text)
+            
+        self.diagram.refresh()
+        self.update_button.setEnabled(True)
         
-        csv_filepath = Path('data', f'{self.status.course_code}.csv')
-        try:
-            csv_file = open(csv_filepath, 'r')
-        except IOError as e:
-            self.error_label.setText(
-                f"There was a problem trying to read {csv_filepath}: {e}")
-            return
-        csv_reader = csv.reader(csv_file)
         
-        # Get the column names (first row). Convert to lowercase and replace
-        # spaces with underscores.
-        column_names = next(csv_reader)
-        dict_labels = [n.lower().replace(' ', '_') for n in column_names]
+    def stop_data_thread(self):
+        self.data_thread.quit()
+        self.data_thread.wait()
         
-        # Get checkpoint data from the rest of the rows.
-        # Ignore empty rows.
-        self.status.checkpoints = [
-            dict(zip(dict_labels, row)) for row in csv_reader
-            if len(row) > 0 and len(row[0]) > 0]
-            
-        # Convert stuff to ints/floats as needed.
-        for c in self.status.checkpoints:
-            c['checkpoint'] = int(c['checkpoint'])
-            c['center_x'] = float(c['center_x'])
-            c['center_y'] = float(c['center_y'])
-            c['center_z'] = float(c['center_z'])
-            c['right_x'] = float(c['right_x'])
-            c['right_y'] = float(c['right_y'])
-            c['right_z'] = float(c['right_z'])
-            
-            # Take care of the track width
-            if 'true_width' in c and c['true_width']:
-                # This is only specified for pipes, which make the normal
-                # track width stat inaccurate
-                c['track_width'] = float(c['true_width'])
-            elif 'track_width' in c and c['track_width']:
-                # Use the normal track width stat if true width isn't specified
-                c['track_width'] = float(c['track_width'])
-            else:
-                # If both are unspecified, use a default
-                c['track_width'] = 90.0
-        
-        # Associate each checkpoint with a color.
-        self.status.checkpoints = add_checkpoint_colors(
-            self.status.checkpoints)
-        
-        
-    def read_data_path(self):
-        csv_filepath = Path(
-            'data',
-            f'{self.status.course_code}_{self.status.data_path_name}.csv')
-        try:
-            csv_file = open(csv_filepath, 'r')
-        except IOError as e:
-            self.error_label.setText(
-                f"There was a problem trying to read {csv_filepath}: {e}")
-            return
-        csv_reader = csv.reader(csv_file)
         
-        # Get the column names (first row). Convert to lowercase and replace
-        # spaces with underscores.
-        column_names = next(csv_reader)
-        dict_labels = [n.lower().replace(' ', '_') for n in column_names]
+    def scan_data_dir(self):
+        """
+        Find the courses and each course's data paths, with a single pass
+        over the CSV files in /data.
+        """
+        self.course_codes = []
+        self.data_path_names_by_course = dict()
         
-        # Get path data from the rest of the rows.
-        # Ignore empty rows.
-        self.status.data_path_points = [
-            dict(zip(dict_labels, row)) for row in csv_reader
-            if len(row) > 0 and len(row[0]) > 0]
-            
-        # Convert stuff to ints/floats as needed.
-        for p in self.status.data_path_points:
-            p['x'] = float(p['x'])
-            p['y'] = float(p['y'])
-            p['z'] = float(p['z'])
-            
+        for path in Path('data').glob('*.csv'):
+            # Course data files have names consisting of all capital
+            # letters and numbers. For example: MCTR, SOSS, CH3
+            match = COURSE_DATA_FILE_REGEX.fullmatch(path.name)
+            if match:
+                self.course_codes.append(match.groups()[0])
+                continue
             
+            # If the course code is MCTR, we expect data path files like
+            # MCTR_skip_success.csv
+            match = PATH_DATA_FILE_REGEX.fullmatch(path.name)
+            if match:
+                course_code, data_path_name = match.groups()
+                self.data_path_names_by_course.setdefault(
+                    course_code, []).append(data_path_name)
+                
+                
     def find_courses_with_crossing_data(self):
-        csv_filepath = Path('data', 'Crossings.csv')
+        # This parses the crossings file, and the reader keeps the result
+        # for when crossing data is shown. Only the track column is needed
+        # here, so bad numbers don't matter yet.
         try:
-            csv_file = open(csv_filepath, 'r')
-        except IOError as e:
+            columns = self.data_reader.read_crossing_columns()
+        except (IOError, ValueError) as e:
             self.error_label.setText(
-                f"There was a problem trying to read {csv_filepath}: {e}")
+                "There was a problem trying to read"
+                f" {CROSSINGS_CSV_FILEPATH}: {e}")
             self.courses_with_crossing_data = []
             return
-        csv_reader = csv.reader(csv_file)
-        
-        # Get the column names (first row). Convert to lowercase and replace
-        # spaces with underscores.
-        column_names = next(csv_reader)
-        dict_labels = [n.lower().replace(' ', '_') for n in column_names]
-        
-        # Get crossing data from the rest of the rows.
-        # Ignore empty rows.
-        crossings = [
-            dict(zip(dict_labels, row)) for row in csv_reader
-            if len(row) > 0 and len(row[0]) > 0]
         
         # Build a set of the tracks with crossing data.
-        self.courses_with_crossing_data = set(c['track'] for c in crossings)
-        
-        
-    def read_crossing_data(self):
-        csv_filepath = Path('data', 'Crossings.csv')
-        try:
-            csv_file = open(csv_filepath, 'r')
-        except IOError as e:
-            self.error_label.setText(
-                f"There was a problem trying to read {csv_filepath}: {e}")
-            self.status.crossing_data = None
-            return
-        csv_reader = csv.reader(csv_file)
-        
-        # Get the column names (first row). Convert to lowercase and replace
-        # spaces with underscores.
-        column_names = next(csv_reader)
-        dict_labels = [n.lower().replace(' ', '_') for n in column_names]
-        
-        # Get crossing data from the rest of the rows.
-        # Ignore empty rows.
-        self.status.crossing_data = [
-            dict(zip(dict_labels, row)) for row in csv_reader
-            if len(row) > 0 and len(row[0]) > 0]
-        # Filter so that we only have data for the current course.
-        self.status.crossing_data = [
-            c for c in self.status.crossing_data
-            if c['track'] == self.status.course_code]
-            
-        # Convert stuff to ints/floats as needed.
-        for c in self.status.crossing_data:
-            c['x1'] = float(c['x1'])
-            c['x2'] = float(c['x2'])
-            c['y1'] = float(c['y1'])
-            c['y2'] = float(c['y2'])
-            c['z1'] = float(c['z1'])
-            c['z2'] = float(c['z2'])
+        self.courses_with_crossing_data = set(columns['track'])
         
         
     def on_course_code_change(self):
@@ -660,32 +863,23 @@ class MainWidget(QWidget):
             self.status.course_code = course_code_text
             
         # Add path choices to data_path_combo_box according to what's
-        # available for the course
+        # available for the course. Block signals so that rebuilding the
+        # choices doesn't send a change signal for each item.
+        data_path_names = self.data_path_names_by_course.get(
+            self.status.course_code, [])
+        self.data_path_combo_box.blockSignals(True)
         self.data_path_combo_box.clear()
-        data_path_names = []
-        
-        if self.status.course_code:
-            # If the course code is MCTR, we expect data files like
-            # MCTR_skip_success.csv
-            data_filenames = os.listdir(Path('data'))
-            path_data_file_regex = re.compile(
-                f'{self.status.course_code}_([A-Za-z0-9_]+)\.csv')
-            
-            for filename in data_filenames:
-                match = re.fullmatch(path_data_file_regex, filename)
-                if match:
-                    data_path_name = match.groups()[0]
-                    data_path_names.append(data_path_name)
         
         if data_path_names:
             self.data_path_combo_box.addItem("No path selected")
+            self.data_path_combo_box.addItems(data_path_names)
             self.data_path_combo_box.setCurrentText("No path selected")
-            for data_path_name in data_path_names:
-                self.data_path_combo_box.addItem(data_path_name)
         else:
             self.data_path_combo_box.addItem("(None)")
             self.data_path_combo_box.setCurrentText("(None)")
             
+        self.data_path_combo_box.blockSignals(False)
+            
         has_crossing_data = (
             self.status.course_code in self.courses_with_crossing_data)
         self.crossings_checkbox.setEnabled(has_crossing_data)